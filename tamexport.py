@@ -40,8 +40,9 @@ export a family-tree as JSON, usable with topographic attribute map (https://git
 # python modules
 #
 #------------------------------------------------------------------------
-from __future__ import unicode_literals
-from functools import partial
+from collections import deque
+from itertools import chain, compress
+from array import array
 
 import os.path
 
@@ -62,9 +63,6 @@ from gramps.gen.errors import (HandleError, FilterError, ReportError, DatabaseEr
 from gramps.gen.const import GRAMPS_LOCALE as glocale
 _ = glocale.translation.gettext
 from gramps.gen.lib import AttributeType, EventRoleType, EventType, Person, PlaceType, NameType, FamilyRelType
-from gramps.gen.utils.file import media_path_full
-from gramps.gen.utils.thumbnails import get_thumbnail_path
-from gramps.gen.plug.report import utils as ReportUtils
 from gramps.gen.plug.report import Report
 from gramps.gen.utils.db import get_timeperiod, get_birth_or_fallback, get_death_or_fallback
 from gramps.gen.utils.location import get_main_location
@@ -91,7 +89,6 @@ from gramps.gen.datehandler import get_date, get_date_formats
 
 def _getDefaultName(person):
     # GIVEN "NICK" SURNAME SUFFIX (geb. BIRTH)
-    import re
     names = []
     try:
         prim = person.get_primary_name()
@@ -141,82 +138,154 @@ def _getLocationName(location, types=None):
             return s
     return None
 
+def _csr(rows):
+    # pack a sequence of integer rows into flat (CSR-style) arrays:
+    # row 'i' is indices[indptr[i]:indptr[i+1]]
+    indptr = array('i', [0])
+    indices = array('i')
+    for row in rows:
+        indices.extend(row)
+        indptr.append(len(indices))
+    return (indptr, indices)
+
+class _CachedDb:
+    """
+    all people and families of the database, fetched in a single pass
+    (rather than issuing one query per handle), along with the lookup
+    tables for walking the family graph (see index())
+    """
+    def __init__(self, db):
+        self.persons = {p.get_handle(): p for p in db.iter_people()}
+        self.families = {f.get_handle(): f for f in db.iter_families()}
+        self.private_persons = frozenset(
+            h for h, p in self.persons.items() if p.private)
+        self.private_families = frozenset(
+            h for h, f in self.families.items() if f.private)
+    def index(self):
+        """
+        build the lookup tables for walking the family graph:
+        - handle-keyed tables of the relations of each person and family
+        - integer ids for all people and families, and the same relations
+          stored as flat integer arrays
+        each person and family is only visited once for this
+        """
+        # handle-keyed tables
+        self.parent_fams = parent_fams = {}
+        self.own_fams = own_fams = {}
+        self.id_of = id_of = {}
+        for h, p in self.persons.items():
+            parent_fams[h] = tuple(p.get_parent_family_handle_list())
+            own_fams[h] = tuple(p.get_family_handle_list())
+            id_of[h] = p.get_gramps_id()
+        self.family_children = family_children = {}
+        self.family_parents = family_parents = {}
+        for h, f in self.families.items():
+            family_children[h] = tuple(cr.ref for cr in f.get_child_ref_list())
+            family_parents[h] = (f.get_father_handle(), f.get_mother_handle())
+
+        # integer-indexed arrays, derived from the tables above
+        self.i2h = list(self.persons)
+        self.h2i = h2i = {h: i for i, h in enumerate(self.i2h)}
+        self.i2fh = list(self.families)
+        self.fh2i = fh2i = {h: i for i, h in enumerate(self.i2fh)}
+        # person -> families (as spouse)
+        self.own_indptr, self.own_indices = _csr(
+            (fh2i[fh] for fh in fams if fh in fh2i)
+            for fams in own_fams.values())
+        # person -> families (as child)
+        self.parent_indptr, self.parent_indices = _csr(
+            (fh2i[fh] for fh in fams if fh in fh2i)
+            for fams in parent_fams.values())
+        # family -> children
+        self.child_indptr, self.child_indices = _csr(
+            (h2i[c] for c in children if c in h2i)
+            for children in family_children.values())
+        # family -> father/mother (-1 if there is none)
+        self.fathers = array('i', (h2i.get(fa, -1)
+                                   for (fa, mo) in family_parents.values()))
+        self.mothers = array('i', (h2i.get(mo, -1)
+                                   for (fa, mo) in family_parents.values()))
+        # privacy flags
+        self.person_private = bytearray(
+            h in self.private_persons for h in self.i2h)
+        self.family_private = bytearray(
+            h in self.private_families for h in self.i2fh)
+    def private_masks(self, incprivate):
+        """
+        the privacy flags of all people and families (by integer id);
+        none are set if private records are to be included anyway
+        """
+        if incprivate:
+            return (bytearray(len(self.i2h)), bytearray(len(self.i2fh)))
+        return (self.person_private, self.family_private)
+
 def filterEdgePeople(db, people=set(), edgepeople=set(), incprivate=False):
     class Filter:
         def __init__(self, db, interestingpeople, edgepeople, incprivate):
-            ## recursively process, starting with _homeperson:
-            ### if currentperson in _people: break
+            ## process all people reachable from the interesting people:
+            ### if currentperson in _people: skip
             ### add currentperson to _people
-            ### if currentperson is in edgepeople: break
+            ### if currentperson is in edgepeople: skip
             ### else:
             ###   add all families of currentperson to _families
-            ###   recurse with all parents
-            ###   recurse with all children
-            ###   recurse with all spouses
-            self._people=set()
-            self._families=set()
-
+            ###   queue all members of these families
+            ###   (parents, children, spouses and siblings)
             self._db=db
             self._incprivate=incprivate
             self._interesting=set(interestingpeople)
             self._edgepeople=edgepeople.difference(self._interesting)
 
-            for person in self._interesting:
-                self._recurse(person)
-
-        def _recurse(self, handle):
-            if not handle:
-                return
-            if handle in self._people:
-                return
-
-            person = self._db.get_person_from_handle(handle)
-            # if this is a private record, and we're not
-            # including private records, then go back to the
-            # top of the while loop to get the next person
-
-            if person.private and not self._incprivate:
-                return
-
-            # remember this person!
-            self._people.add(handle)
-
-            # if this person is an edge-case, we are done
-            if handle in self._edgepeople:
-                return
+            self._walk(self._interesting)
+
+        def _walk(self, handles):
+            db = self._db
+            h2i = db.h2i
+            i2h = db.i2h
+            own_indptr, own_indices = db.own_indptr, db.own_indices
+            parent_indptr, parent_indices = db.parent_indptr, db.parent_indices
+            child_indptr, child_indices = db.child_indptr, db.child_indices
+            fathers, mothers = db.fathers, db.mothers
+            edgepeople = {h2i[h] for h in self._edgepeople if h in h2i}
+            private = db.private_masks(self._incprivate)[0]
+
+            people = bytearray(len(i2h))
+            families = bytearray(len(db.i2fh))
+            queue = deque(h2i[h] for h in handles if h in h2i)
+            while queue:
+                i = queue.popleft()
+                if people[i]:
+                    continue
 
-            ## find spouses and children
-            ## by walking through all families were we are parent
-            for family_handle in person.get_family_handle_list():
-                if not family_handle in self._families:
-                    self._families.add(family_handle)
-                    family = self._db.get_family_from_handle(family_handle)
+                # if this is a private record, and we're not
+                # including private records, then go back to the
+                # top of the while loop to get the next person
+                if private[i]:
+                    continue
 
-                    ## add spouse
-                    spouse_handle = ReportUtils.find_spouse(person, family)
-                    self._recurse(spouse_handle)
+                # remember this person!
+                people[i] = 1
 
-                    ## add children
-                    for child_ref in family.get_child_ref_list():
-                        self._recurse(child_ref.ref)
+                # if this person is an edge-case, we are done
+                if i in edgepeople:
+                    continue
 
-            ## find parents
-            for family_handle in person.get_parent_family_handle_list():
-                if not family_handle in self._families:
-                    self._families.add(family_handle)
-                    family = self._db.get_family_from_handle(family_handle)
+                ## find spouses, children, parents and siblings
+                ## by walking through all families were we are a member
+                for f in chain(own_indices[own_indptr[i]:own_indptr[i+1]],
+                               parent_indices[parent_indptr[i]:parent_indptr[i+1]]):
+                    if not families[f]:
+                        families[f] = 1
+                        if fathers[f] >= 0:
+                            queue.append(fathers[f])
+                        if mothers[f] >= 0:
+                            queue.append(mothers[f])
+                        queue.extend(child_indices[child_indptr[f]:child_indptr[f+1]])
 
-                    ## add parents
-                    self._recurse(family.get_father_handle())
-                    self._recurse(family.get_mother_handle())
-                    ## add siblings
-                    for sibling_ref in family.get_child_ref_list():
-                        self._recurse(sibling_ref.ref)
+            self._people = set(compress(i2h, people))
+            self._families = set(compress(db.i2fh, families))
 
 
     f=Filter(db, people, edgepeople, incprivate)
-    import sys
-    sys.stdout.flush()
     return (f._people, f._families)
 
 #------------------------------------------------------------------------
@@ -246,6 +315,12 @@ class TAMexportReport(Report):
         self._deleted_families = 0
         self._options = options
 
+        # fetch all people and families at once
+        self._cachedb = _CachedDb(database)
+        self._person_cache = self._cachedb.persons
+        self._family_cache = self._cachedb.families
+        self._private_families = self._cachedb.private_families
+
         menu = options.menu
         get_value = lambda name: menu.get_option_by_name(name).get_value()
 
@@ -264,6 +339,11 @@ class TAMexportReport(Report):
         #self._livinganonymous = get_value('livinganonymous')
 
         self._incprivate = get_value('incl_private')
+        # the families that may be included in the report at all
+        if self._incprivate:
+            self._visible_families = self._family_cache.keys()
+        else:
+            self._visible_families = self._family_cache.keys() - self._private_families
 
         include_all = get_value('allpeople')
 
@@ -288,11 +368,10 @@ class TAMexportReport(Report):
                     #option can be from another family tree, so person can be None
                     self._interest_set.add(person.get_handle())
         if not self._interest_set:
-            print("empty interest set, everybody is interesting")
+            log.debug("empty interest set, everybody is interesting")
             include_all = True
         if include_all:
-            for cnt, prs in enumerate(self.database.iter_people()):
-                self._interest_set.add(prs.get_handle())
+            self._interest_set.update(self._person_cache)
 
         # edge people: the edgelist
         if edgelist:
@@ -302,7 +381,7 @@ class TAMexportReport(Report):
                     #option can be from another family tree, so person can be None
                     self._edge_set.add(person.get_handle())
         else:
-            print("empty edgelist")
+            log.debug("empty edgelist")
 
         name_format = menu.get_option_by_name("name_format").get_value()
         if name_format != 0:
@@ -319,6 +398,8 @@ class TAMexportReport(Report):
         from the database is going to be output into the report
         """
 
+        self._build_adjacency()
+
         # starting with the people of interest, we then add parents:
         self._people.clear()
         self._families.clear()
@@ -326,7 +407,7 @@ class TAMexportReport(Report):
         if self._edge_set:
             ## user provided a list of interesting (edge) people
             (p,f) = filterEdgePeople(
-                self.database,
+                self._cachedb,
                 self._interest_set, self._edge_set,
                 self._incprivate)
 
@@ -349,27 +430,60 @@ class TAMexportReport(Report):
         # ...and/or with the people of interest we add their children:
         if self._followchild:
             self.findChildren()
+
+        # drop the families that no longer link anybody we output
+        self.pruneFamilies()
+
         # once we get here we have a full list of people
         # and families that we need to generate a report
 
         ### estimate dates
         self.estimate_person_times()
 
+    def _build_adjacency(self):
+        # flat lookup tables for walking the family graph,
+        # so we don't have to go through the Person/Family objects each time
+        cachedb = self._cachedb
+        cachedb.index()
+        self._parent_fams = cachedb.parent_fams
+        self._own_fams = cachedb.own_fams
+        self._family_children = cachedb.family_children
+        self._family_parents = cachedb.family_parents
+        self._id_of = cachedb.id_of
+        # the people of interest as integer ids, for the graph walks
+        h2i = cachedb.h2i
+        self._interest_ids = array('i', (h2i[h] for h in self._interest_set))
+
     def write_report(self):
         """
         Inherited method; called by report() in _ReportDialog.py
         """
-        import json
+        from json.encoder import encode_basestring as quote
         doc = self._options.get_document()
+        if not doc:
+            return
 
         # now that begin_report() has done the work, output what we've
-        # obtained into whatever file or format the user expects to use
-        data = {
-            "nodes": self.getPeople(),
-            "links": self.getFamilies(),
-        }
-        if doc:
-            json.dump(data, doc, indent=4)
+        # obtained into whatever file or format the user expects to use.
+        # the records are plain tuples, that are formatted and written
+        # one by one, rather than building the entire document in memory first
+        def write_array(lines):
+            sep = "\n"
+            for line in lines:
+                doc.write(sep)
+                doc.write(line)
+                sep = ",\n"
+            doc.write("\n")
+
+        doc.write('{"nodes": [')
+        write_array('{"id": %s, "name": %s, "value": %d}'
+                    % (quote(id), quote(name), value)
+                    for (id, name, value) in self._iter_nodes())
+        doc.write('], "links": [')
+        write_array('{"source": %s, "target": %s, "directed": %s}'
+                    % (quote(source), quote(target), "true" if directed else "false")
+                    for (source, target, directed) in self._iter_links())
+        doc.write(']}\n')
 
 
     def _estimate_person_times(self, estimator=None):
@@ -377,7 +491,7 @@ class TAMexportReport(Report):
         if estimator is None:
             estimator = self.get_estimated_persontime
         for h in self._people:
-            person = self.database.get_person_from_handle(h)
+            person = self._person_cache.get(h)
             id = person.get_gramps_id()
             if id in self._peopledates:
                 continue
@@ -390,20 +504,40 @@ class TAMexportReport(Report):
 
     def estimate_person_times(self):
         self._peopledates = {}
+        self._base_dates = {}
         # fill in known dates for a person
         missing = self._estimate_person_times()
-        # estimate dates of a person based on their relations
-        oldmiss = missing + 1
-        print("estimating person times: missing=%s" % (missing,))
-        while missing and oldmiss > missing:
-            oldmiss = missing
-            missing = self._estimate_person_times(self.person_time_of_peers)
-            print("still missing: %s" % (missing,))
+        # estimate dates of a person based on their relations:
+        # whenever a person gets a date, their undated peers become estimable,
+        # so we only need to look at each relation once
+        log.debug("estimating person times: missing=%s", missing)
+        peopledates = self._peopledates
+        id_of = self._id_of
+        worklist = deque(h for h in self._people if id_of[h] in peopledates)
+        while missing and worklist:
+            for peer in self._peers(worklist.popleft()):
+                if peer not in self._people:
+                    continue
+                id = id_of[peer]
+                if id in peopledates:
+                    continue
+                date = self.person_time_of_peers(self._person_cache[peer])
+                if date:
+                    peopledates[id] = date
+                    missing -= 1
+                    worklist.append(peer)
+        log.debug("still missing: %s", missing)
+
+    def _peers(self, handle):
+        # parents, children, siblings and spouses of a person (and the person)
+        for family_handle in chain(self._parent_fams[handle], self._own_fams[handle]):
+            yield from self._family_parents[family_handle]
+            yield from self._family_children[family_handle]
 
     def person_time_of_peers(self, person):
         x = self._person_time_of_peers(person)
         if x:
-            print("estimated '%s' at %s" % (person.get_gramps_id(), x))
+            log.debug("estimated '%s' at %s", person.get_gramps_id(), x)
         return x
     def _person_time_of_peers(self, person):
         # assume that this person doesn't have any date attached directly to them
@@ -411,34 +545,44 @@ class TAMexportReport(Report):
         # estimate of earliest age when one becomes a parent
         birther_age = 20
 
-        def handlefun2age(handlefun):
-            id = self.as_gramps_id(handlefun)
-            if not id:
-                return None
-            return self._peopledates.get(id)
+        # this only needs the lookup tables, not the Person/Family objects
+        peopledates = self._peopledates
+        id_of = self._id_of
+        family_parents = self._family_parents
+        family_children = self._family_children
 
         def families2ages(family_handles, parent_births, children_births):
             for family_handle in family_handles:
-                family = self.database.get_family_from_handle(family_handle)
                 # to get the birth-date of the youngest parent (if any)
-                parent_births.append(handlefun2age(family.get_father_handle))
-                parent_births.append(handlefun2age(family.get_mother_handle))
+                for parent in family_parents[family_handle]:
+                    parent_births.append(peopledates.get(id_of.get(parent)))
                 # and the birth-dates of all the siblings
-                for sib in family.get_child_ref_list():
-                    sibling = self.database.get_person_from_handle(sib.ref)
-                    if sibling:
-                        children_births.append(self._peopledates.get(sibling.get_gramps_id()))
+                for sib in family_children[family_handle]:
+                    children_births.append(peopledates.get(id_of.get(sib)))
 
         def mean(data):
-            data = list(filter(None, data))
-            if data:
-                return sum(data) / len(data)
+            total = 0
+            count = 0
+            for v in data:
+                if v:
+                    total += v
+                    count += 1
+            if count:
+                return total / count
+
+        def maxNotNone(data):
+            result = None
+            for v in data:
+                if v and (result is None or v > result):
+                    result = v
+            return result
 
-        def mapNotNone(fun, data):
-            try:
-                return fun(filter(None, data))
-            except:
-                pass
+        def minNotNone(data):
+            result = None
+            for v in data:
+                if v and (result is None or v < result):
+                    result = v
+            return result
 
         parent_births = []
         child_births = []
@@ -448,17 +592,18 @@ class TAMexportReport(Report):
         # iterate over all families, where 'person' is a child
         # to get the birth-date of the youngest parent (if any)
         # and the birth-dates of all the siblings
-        families2ages(person.get_parent_family_handle_list(), parent_births, sibling_births)
+        handle = person.get_handle()
+        families2ages(self._parent_fams[handle], parent_births, sibling_births)
 
         # iterate over all families, where 'person' is a spouse/parent
         # to get the birth-date of the oldest child (if any)
         # and the birth-dates of all the spouses
-        families2ages(person.get_family_handle_list(), spouse_births, child_births)
+        families2ages(self._own_fams[handle], spouse_births, child_births)
 
         ## get the youngest parent
-        parent_birth=mapNotNone(max, parent_births)
+        parent_birth=maxNotNone(parent_births)
         ## get the oldest child
-        child_birth=mapNotNone(min, child_births)
+        child_birth=minNotNone(child_births)
         ## get the mean age of spouses
         spouse_birth = mean(spouse_births)
         ## get the mean age of siblings
@@ -486,16 +631,21 @@ class TAMexportReport(Report):
         return None
 
     def get_estimated_persontime(self, person):
-        date = self._peopledates.get(person.get_gramps_id(), None)
+        id = person.get_gramps_id()
+        date = self._peopledates.get(id, None)
         if date is not None:
             return date
+        # the dates attached to a person don't change, so only look them up once
+        if id in self._base_dates:
+            return self._base_dates[id]
         date = get_timeperiod(self.database, person)
         if date is not None:
             try:
-                return date.get_date_object().get_year()
+                date = date.get_date_object().get_year()
             except:
-                return date
-        return  None
+                pass
+        self._base_dates[id] = date
+        return date
 
     def get_person_birthdeath(self, person, format=None):
         def _get_date(date):
@@ -509,98 +659,123 @@ class TAMexportReport(Report):
 
 
     def findParents(self):
+        # this walks the integer-indexed family graph,
+        # and only converts back to handles once we are done
+        db = self._cachedb
+        h2i = db.h2i
+        own_indptr, own_indices = db.own_indptr, db.own_indices
+        parent_indptr, parent_indices = db.parent_indptr, db.parent_indices
+        child_indptr, child_indices = db.child_indptr, db.child_indices
+        fathers, mothers = db.fathers, db.mothers
+        (person_private, family_private) = db.private_masks(self._incprivate)
+        limitparents = self._limitparents
+        maxparents = self._maxparents
+
+        # the people and families we're going to output
+        people = bytearray(len(db.i2h))
+        families = bytearray(len(db.i2fh))
+        for h in self._people:
+            people[h2i[h]] = 1
+
         # we need to start with all of our "people of interest"
-        ancestorsNotYetProcessed = set(self._interest_set)
+        ancestorsNotYetProcessed = deque(self._interest_ids)
+        queued = bytearray(len(db.i2h))
+        for i in ancestorsNotYetProcessed:
+            queued[i] = 1
+        # number of people that are either queued or already in our list
+        frontier_count = len(ancestorsNotYetProcessed) + len(self._people)
 
         # now we find all the immediate ancestors of our people of interest
 
         while ancestorsNotYetProcessed:
-            handle = ancestorsNotYetProcessed.pop()
-
-            # One of 2 things can happen here:
-            #   1) we've already know about this person and he/she is already
-            #      in our list
-            #   2) this is someone new, and we need to remember him/her
-            #
-            # In the first case, there isn't anything else to do, so we simply
-            # go back to the top and pop the next person off the list.
-            #
-            # In the second case, we need to add this person to our list, and
+            i = ancestorsNotYetProcessed.popleft()
+            queued[i] = 0
+
+            # people are only queued if we don't know about them yet,
+            # so there's not much left to check here:
+            # we need to add this person to our list, and
             # then go through all of the parents this person has to find more
             # people of interest.
 
-            if handle not in self._people:
-                person = self.database.get_person_from_handle(handle)
-
-                # if this is a private record, and we're not
-                # including private records, then go back to the
-                # top of the while loop to get the next person
-                if person.private and not self._incprivate:
-                    continue
-
-                # remember this person!
-                self._people.add(handle)
+            if people[i]:
+                frontier_count -= 1
+                continue
 
-                # see if a family exists between this person and someone else
-                # we have on our list of people we're going to output -- if
-                # there is a family, then remember it for when it comes time
-                # to link spouses together
-                for family_handle in person.get_family_handle_list():
-                    family = self.database.get_family_from_handle(family_handle)
-                    spouse_handle = ReportUtils.find_spouse(person, family)
-                    if spouse_handle:
-                        if (spouse_handle in self._people or
-                           spouse_handle in ancestorsNotYetProcessed):
-                            self._families.add(family_handle)
+            # if this is a private record, and we're not
+            # including private records, then go back to the
+            # top of the while loop to get the next person
+            if person_private[i]:
+                frontier_count -= 1
+                continue
 
+            # remember this person!
+            people[i] = 1
+
+            # see if a family exists between this person and someone else
+            # we have on our list of people we're going to output -- if
+            # there is a family, then remember it for when it comes time
+            # to link spouses together
+            for f in own_indices[own_indptr[i]:own_indptr[i+1]]:
+                spouse = mothers[f] if fathers[f] == i else fathers[f]
+                if spouse >= 0 and (people[spouse] or queued[spouse]):
+                    families[f] = 1
+
+
+            # if we have a limit on the number of people, and we've
+            # reached that limit, then don't attempt to find any
+            # more ancestors
+            if limitparents and (maxparents < frontier_count):
+                # get back to the top of the while loop so we can finish
+                # processing the people queued up in the "not yet
+                # processed" list
+                continue
 
-                # if we have a limit on the number of people, and we've
-                # reached that limit, then don't attempt to find any
-                # more ancestors
-                if self._limitparents and (self._maxparents <
-                        len(ancestorsNotYetProcessed) + len(self._people)):
-                    # get back to the top of the while loop so we can finish
-                    # processing the people queued up in the "not yet
-                    # processed" list
+            # queue the parents of the person we're processing
+            for f in parent_indices[parent_indptr[i]:parent_indptr[i+1]]:
+                if family_private[f]:
                     continue
 
-                # queue the parents of the person we're processing
-                for family_handle in person.get_parent_family_handle_list():
-                    family = self.database.get_family_from_handle(family_handle)
-
-                    if not family.private or self._incprivate:
-                        try:
-                            father = self.database.get_person_from_handle(
-                                family.get_father_handle())
-                        except AttributeError: father = None
-                        try:
-                            mother = self.database.get_person_from_handle(
-                                family.get_mother_handle())
-                        except AttributeError: mother = None
-                        if father:
-                            if not father.private or self._incprivate:
-                                ancestorsNotYetProcessed.add(
-                                                 family.get_father_handle())
-                                self._families.add(family_handle)
-                        if mother:
-                            if not mother.private or self._incprivate:
-                                ancestorsNotYetProcessed.add(
-                                                 family.get_mother_handle())
-                                self._families.add(family_handle)
-
-                        for sib in family.get_child_ref_list():
-                            sibling = self.database.get_person_from_handle(sib.ref)
-                            if sibling and (not sibling.private or self._incprivate):
-                                ancestorsNotYetProcessed.add(sib.ref)
-                                self._families.add(family_handle)
+                # father, mother and siblings
+                for relative in chain((fathers[f], mothers[f]),
+                                      child_indices[child_indptr[f]:child_indptr[f+1]]):
+                    if relative < 0 or person_private[relative]:
+                        continue
+                    if not people[relative] and not queued[relative]:
+                        queued[relative] = 1
+                        ancestorsNotYetProcessed.append(relative)
+                        frontier_count += 1
+                    families[f] = 1
+
+        self._people.update(compress(db.i2h, people))
+        self._families.update(compress(db.i2fh, families))
+
+    def _build_surname_cache(self):
+        # the (encoded) surnames of all people, for comparing families
+        self._enc_surname = {
+            h: p.get_primary_name().get_surname().encode('iso-8859-1','xmlcharrefreplace')
+            for h, p in self._person_cache.items()}
 
     def removeUninterestingParents(self):
+        self._build_surname_cache()
+
+        # bind the lookups that are used in the loop
+        people = self._people
+        enc_surname = self._enc_surname
+        own_fams = self._own_fams
+        parent_fams = self._parent_fams
+        family_parents = self._family_parents
+        family_children = self._family_children
+        visible_families = self._visible_families
+        interest_set = self._interest_set
+
         # start with all the people we've already identified
-        unprocessed_parents = set(self._people)
+        unprocessed_parents = set(people)
 
-        while len(unprocessed_parents) > 0:
-            handle = unprocessed_parents.pop()
-            person = self.database.get_person_from_handle(handle)
+        # the surnames of all people of interest
+        interest_surnames = frozenset(enc_surname[h] for h in interest_set)
+
+        while unprocessed_parents:
+            person_handle = unprocessed_parents.pop()
 
             # There are a few things we're going to need,
             # so look it all up right now; such as:
@@ -622,67 +797,63 @@ class TAMexportReport(Report):
             spouse_father_handle = None
             spouse_mother_handle = None
             spouse_surname = ""
-            surname = person.get_primary_name().get_surname()
-            surname = surname.encode('iso-8859-1','xmlcharrefreplace')
+            surname = enc_surname[person_handle]
 
             # first we get the person's father and mother
-            for family_handle in person.get_parent_family_handle_list():
-                family = self.database.get_family_from_handle(family_handle)
-                handle = family.get_father_handle()
-                if handle in self._people:
-                    father_handle = handle
-                handle = family.get_mother_handle()
-                if handle in self._people:
-                    mother_handle = handle
+            for family_handle in parent_fams[person_handle]:
+                (father, mother) = family_parents[family_handle]
+                if father in people:
+                    father_handle = father
+                if mother in people:
+                    mother_handle = mother
 
             # now see how many spouses this person has
-            for family_handle in person.get_family_handle_list():
-                family = self.database.get_family_from_handle(family_handle)
-                handle = ReportUtils.find_spouse(person, family)
-                if handle in self._people:
+            # (we only need to know whether there are more than one)
+            for family_handle in own_fams[person_handle]:
+                (father, mother) = family_parents[family_handle]
+                handle = mother if father == person_handle else father
+                if handle in people:
                     spouse_count += 1
-                    spouse = self.database.get_person_from_handle(handle)
                     spouse_handle = handle
-                    spouse_surname = spouse.get_primary_name().get_surname()
-                    spouse_surname = spouse_surname.encode(
-                                        'iso-8859-1', 'xmlcharrefreplace'
-                                        )
-
-                    # see if the spouse has parents
-                    if not spouse_father_handle and not spouse_mother_handle:
-                        for family_handle in \
-                          spouse.get_parent_family_handle_list():
-                            family = self.database.get_family_from_handle(
-                                                              family_handle)
-                            handle = family.get_father_handle()
-                            if handle in self._people:
-                                spouse_father_handle = handle
-                            handle = family.get_mother_handle()
-                            if handle in self._people:
-                                spouse_mother_handle = handle
+                    if spouse_count > 1:
+                        break
+
+            # if this person has many spouses of interest, then we
+            # automatically keep this person
+            if spouse_count > 1:
+                continue
 
             # get the number of children that we think might be interesting
-            for family_handle in person.get_family_handle_list():
-                family = self.database.get_family_from_handle(family_handle)
-                if family.private and not self._incprivate:
-                    for child_ref in family.get_child_ref_list():
-                        if child_ref.ref in self._people:
+            # (again, we only need to know whether there are more than one)
+            for family_handle in own_fams[person_handle]:
+                if family_handle in visible_families:
+                    for child in family_children[family_handle]:
+                        if child in people:
                             child_count += 1
-                            child_handle = child_ref.ref
-
-            # we now have everything we need -- start looking for reasons
-            # why this is a person we need to keep in our list, and loop
-            # back to the top as soon as a reason is discovered
+                            child_handle = child
+                            if child_count > 1:
+                                break
+                    if child_count > 1:
+                        break
 
             # if this person has many children of interest, then we
             # automatically keep this person
             if child_count > 1:
                 continue
 
-            # if this person has many spouses of interest, then we
-            # automatically keep this person
-            if spouse_count > 1:
-                continue
+            # we have at most a single spouse, see if they have parents
+            if spouse_handle:
+                spouse_surname = enc_surname[spouse_handle]
+                for family_handle in parent_fams[spouse_handle]:
+                    (father, mother) = family_parents[family_handle]
+                    if father in people:
+                        spouse_father_handle = father
+                    if mother in people:
+                        spouse_mother_handle = mother
+
+            # we now have everything we need -- start looking for reasons
+            # why this is a person we need to keep in our list, and loop
+            # back to the top as soon as a reason is discovered
 
             # if this person has parents, then we automatically keep
             # this person
@@ -695,32 +866,24 @@ class TAMexportReport(Report):
                 continue
 
             # if this is a person of interest, then we automatically keep
-            if person.get_handle() in self._interest_set:
+            if person_handle in interest_set:
                 continue
 
             # if the spouse is a person of interest, then we keep
-            if spouse_handle in self._interest_set:
+            if spouse_handle in interest_set:
                 continue
 
             # if the surname (or the spouse's surname) matches a person
             # of interest, then we automatically keep this person
-            bKeepThisPerson = False
-            for personOfInterestHandle in self._interest_set:
-                personOfInterest = self.database.get_person_from_handle(personOfInterestHandle)
-                surnameOfInterest = personOfInterest.get_primary_name().get_surname().encode('iso-8859-1','xmlcharrefreplace')
-                if surnameOfInterest == surname or surnameOfInterest == spouse_surname:
-                    bKeepThisPerson = True
-                    break
-
-            if bKeepThisPerson:
+            if surname in interest_surnames or spouse_surname in interest_surnames:
                 continue
 
             # took us a while, but if we get here, then we can remove this person
             self._deleted_people += 1
-            self._people.remove(person.get_handle())
+            people.remove(person_handle)
 
             # we can also remove any families to which this person belonged
-            for family_handle in person.get_family_handle_list():
+            for family_handle in self._own_fams[person_handle]:
                 if family_handle in self._families:
                     self._deleted_families += 1
                     self._families.remove(family_handle)
@@ -737,127 +900,157 @@ class TAMexportReport(Report):
 
 
     def findChildren(self):
-        # we need to start with all of our "people of interest"
-        childrenNotYetProcessed = set(self._interest_set)
-        childrenToInclude = set()
-
-        # now we find all the children of our people of interest
-
-        while len(childrenNotYetProcessed) > 0:
-            handle = childrenNotYetProcessed.pop()
+        # like findParents, this walks the integer-indexed family graph,
+        # and only converts back to handles once we are done
+        db = self._cachedb
+        own_indptr, own_indices = db.own_indptr, db.own_indices
+        child_indptr, child_indices = db.child_indptr, db.child_indices
+        fathers, mothers = db.fathers, db.mothers
+        (person_private, family_private) = db.private_masks(self._incprivate)
+        limit = self._limitchildren
+        maxchildren = self._maxchildren
 
-            if handle not in childrenToInclude:
+        # we need to start with all of our "people of interest"
+        # (processed in the order they were queued)
+        childrenNotYetProcessed = deque(self._interest_ids)
+        childrenQueued = bytearray(len(db.i2h))
+        for i in childrenNotYetProcessed:
+            childrenQueued[i] = 1
+        childrenToInclude = bytearray(len(db.i2h))
+        includeCount = 0
+        # families whose children (and spouses) we already know about
+        familiesProcessed = bytearray(len(db.i2fh))
+        # the families we're going to output
+        families_out = bytearray(len(db.i2fh))
+
+        # now we find all the children of our people of interest,
+        # one generation at a time
+
+        while childrenNotYetProcessed:
+            frontier = list(childrenNotYetProcessed)
+            childrenNotYetProcessed.clear()
+
+            # first pick the people of this generation that we want to expand
+            parents = []
+            for i in frontier:
+                # if we have a limit on the number of people, and we've
+                # reached that limit, then don't attempt to find any
+                # more children
+                if limit and includeCount >= maxchildren:
+                    break
 
-                person = self.database.get_person_from_handle(handle)
+                if childrenToInclude[i]:
+                    continue
 
                 # if this is a private record, and we're not
                 # including private records, then go back to the
-                # top of the while loop to get the next person
-                if person.private and not self._incprivate:
+                # top of the loop to get the next person
+                if person_private[i]:
                     continue
 
                 # remember this person!
-                childrenToInclude.add(handle)
-
-                # if we have a limit on the number of people, and we've
-                # reached that limit, then don't attempt to find any
-                # more children
-                if self._limitchildren and (
-                    self._maxchildren < (
-                        len(childrenNotYetProcessed) + len(childrenToInclude)
-                        )
-                    ):
-                    # get back to the top of the while loop so we can finish
-                    # processing the people queued up in the "not yet processed" list
-                    continue
-
-                # iterate through this person's families
-                for family_handle in person.get_family_handle_list():
-                    family = self.database.get_family_from_handle(family_handle)
-                    if (family.private and self._incprivate) or not family.private:
-
-                        # queue up any children from this person's family
-                        for childRef in family.get_child_ref_list():
-                            child = self.database.get_person_from_handle(childRef.ref)
-                            if (child.private and self._incprivate) or not child.private:
-                                childrenNotYetProcessed.add(child.get_handle())
-                                self._families.add(family_handle)
-
-                        # include the spouse from this person's family
-                        spouse_handle = ReportUtils.find_spouse(person, family)
-                        if spouse_handle:
-                            spouse = self.database.get_person_from_handle(spouse_handle)
-                            if (spouse.private and self._incprivate) or not spouse.private:
-                                childrenToInclude.add(spouse_handle)
-                                self._families.add(family_handle)
+                childrenToInclude[i] = 1
+                includeCount += 1
+                parents.append(i)
+
+            # then collect all their families at once,
+            # so each family is only looked at once
+            families = {}
+            for i in parents:
+                for f in own_indices[own_indptr[i]:own_indptr[i+1]]:
+                    if (not family_private[f] and
+                       not familiesProcessed[f] and
+                       f not in families):
+                        families[f] = i
+
+            # and finally queue the children and include the spouses
+            for f, i in families.items():
+                familiesProcessed[f] = 1
+
+                # queue up any children from this person's family
+                for child in child_indices[child_indptr[f]:child_indptr[f+1]]:
+                    if not person_private[child]:
+                        if not childrenQueued[child]:
+                            childrenQueued[child] = 1
+                            childrenNotYetProcessed.append(child)
+                        families_out[f] = 1
+
+                # include the spouse from this person's family
+                spouse = mothers[f] if fathers[f] == i else fathers[f]
+                if spouse >= 0 and not person_private[spouse]:
+                    if not childrenToInclude[spouse]:
+                        childrenToInclude[spouse] = 1
+                        includeCount += 1
+                    families_out[f] = 1
 
         # we now merge our temp set "childrenToInclude" into our master set
-        self._people.update(childrenToInclude)
-
-    def getPeople(self):
+        self._people.update(compress(db.i2h, childrenToInclude))
+        self._families.update(compress(db.i2fh, families_out))
+
+    def pruneFamilies(self):
+        # a family is only kept if at least one of its parents
+        # or children is among the people we are going to output
+        people = self._people
+        family_parents = self._family_parents
+        family_children = self._family_children
+        self._families.difference_update([
+            family_handle for family_handle in self._families
+            if people.isdisjoint(family_parents[family_handle])
+            and people.isdisjoint(family_children[family_handle])])
+
+    def _person_label(self, handle):
+        # the label of a person (name and dates)
+        person = self._person_cache.get(handle)
+        name = self.format_name(person)
+        if self._incdates:
+            birth,death = self.get_person_birthdeath(person, self._date_format)
+        else:
+            birth,death = (None,None)
+        birthdeath = ""
+        if birth:
+            birthdeath = "%s-" % birth
+        if death:
+            if not birthdeath:
+                birthdeath = "-"
+            birthdeath = "%s%s" % (birthdeath, death)
+        if birthdeath:
+            birthdeath = "\n(%s)" % birthdeath
+        return "%s%s" % (name, birthdeath)
+
+    def _iter_nodes(self):
         # loop through all the people we need to output
-        def handle2json(handle):
-            person = self.database.get_person_from_handle(handle)
-            name = self.format_name(person)
-            if self._incdates:
-                birth,death = self.get_person_birthdeath(person, self._date_format)
-            else:
-                birth,death = (None,None)
-            birthdeath = ""
-            if birth:
-                birthdeath = "%s-" % birth
-            if death:
-                if not birthdeath:
-                    birthdeath = "-"
-                birthdeath = "%s%s" % (birthdeath, death)
-            if birthdeath:
-                birthdeath = "\n(%s)" % birthdeath
-            return  {
-                "id": person.get_gramps_id(),
-                "name": "%s%s" % (name, birthdeath),
-                "value": self.get_estimated_persontime(person) or 0,
-            }
-        return [handle2json(_) for _ in self._people ]
-
-    def as_gramps_id(self, fun):
-        x = fun()
-        if not x: return
-        x = self.database.get_person_from_handle(x)
-        if x:
-            try:
-                y = x.get_gramps_id()
-                return y
-            except: pass
-        return None
-
-    def getFamilies(self):
-        def family2json(family):
-            #{"source": "@I0032@", "target": "@I0036@", "directed": true},
-            father = self.as_gramps_id(family.get_father_handle)
-            mother = self.as_gramps_id(family.get_mother_handle)
-            # link the children to the family
-            result = []
-            if father and mother:
-                result.append({"source": father, "target": mother, "directed": False})
-            for childRef in family.get_child_ref_list():
-                if childRef.ref in self._people:
-                    child = self.database.get_person_from_handle(childRef.ref)
-                    if child:
-                        child = child.get_gramps_id()
-                    if child and father:
-                        result.append({"source": father, "target": child, "directed": True})
-                    if child and mother:
-                        result.append({"source": mother, "target": child, "directed": True})
-            return result
-
-        # now that we have the families written, go ahead and link the parents and children to the families
+        id_of = self._id_of
+        get_person = self._person_cache.get
+        for handle in self._people:
+            yield (id_of[handle],
+                   self._person_label(handle),
+                   self.get_estimated_persontime(get_person(handle)) or 0)
+
+    def _family_links(self, family_handle):
+        # the links of a single family:
+        # father-mother and parent-child for children in the report
+        #{"source": "@I0032@", "target": "@I0036@", "directed": true},
+        id_of = self._id_of
+        people = self._people
+        (father, mother) = self._family_parents[family_handle]
+        father = id_of.get(father) if father else None
+        mother = id_of.get(mother) if mother else None
         result = []
-        for family_handle in self._families:
-            # get the parents for this family
-            family = self.database.get_family_from_handle(family_handle)
-            result += family2json(family)
+        if father and mother:
+            result.append((father, mother, False))
+        for child in self._family_children[family_handle]:
+            if child in people:
+                child = id_of.get(child)
+                if child and father:
+                    result.append((father, child, True))
+                if child and mother:
+                    result.append((mother, child, True))
         return result
 
+    def _iter_links(self):
+        # now that we have the families written, go ahead and link the parents and children to the families
+        return chain.from_iterable(map(self._family_links, self._families))
+
 
 
 #------------------------------------------------------------------------
@@ -874,10 +1067,57 @@ class TAMexportReport(Report):
 #
 #------------------------------------------------------------------------
 from gramps.gen.plug.report import MenuReportOptions
-from gramps.gen.plug.report import stdoptions
-from gramps.gen.plug.menu import Option
-from gramps.gen.plug.menu import (NumberOption, BooleanOption,
-                                  EnumeratedListOption, PersonListOption)
+
+# the (translated) labels and help texts of the report options;
+# these are only looked up the first time the dialog is opened
+_T = {}
+def _translations():
+    if not _T:
+        _T.update({
+            'cat_report': _('Report Options'),
+            'cat_edge': _('Edge people'),
+            'cat_interest': _('Interesting people'),
+            'followpar': _('Follow parents to determine '
+                           '"family lines"'),
+            'followchild': _('Follow children to determine '
+                             '"family lines"'),
+            'incdates': _('Include dates'),
+            'incdates_help': _('Whether to include dates for people.'),
+            'edgelist': _('Edge people'),
+            'edgelist_help': _('Edge people are used as boundaries. '
+                               'They will not be traversed when determining the full "family".'),
+            'limitparents': _('Limit the number of ancestors'),
+            'limitparents_help': _('Whether to '
+                                   'limit the number of ancestor generations.'),
+            'maxparents_help': _('The maximum number '
+                                 'of ancestor generations to include.'),
+            'limitchildren': _('Limit the number '
+                               'of descendants'),
+            'limitchildren_help': _('Whether to '
+                                    'limit the number of descendant generations.'),
+            'maxchildren_help': _('The maximum number '
+                                  'of descendant generations to include.'),
+            'gidlist': _('Some people'),
+            'allpeople': _('Include all people'),
+            'allpeople_help': _('Mark all people as interesting.'),
+            'removeextra': _('Try to remove extra '
+                             'people and families'),
+            'removeextra_help': _('People and families not directly '
+                                  'related to people of interest will '
+                                  'be removed when determining '
+                                  '"family lines".'),
+            'interestlist': _('Interesting people'),
+            'interestlist_help': _('People whose families to include '
+                                   'apart from the "Main Person".'),
+            })
+    return _T
+
+def _option(option_class, args, help_text=None):
+    # create a menu option, along with its help text
+    option = option_class(*args)
+    if help_text:
+        option.set_help(help_text)
+    return option
 
 # TODO: override gramps.gui.plug.report.ReportDialog() to fix the file-path
 class TAMexportOptions(MenuReportOptions):
@@ -885,24 +1125,43 @@ class TAMexportOptions(MenuReportOptions):
     Defines all of the controls necessary
     to configure the FamilyLines report.
     """
+    # MenuReportOptions still has a __dict__,
+    # but at least our own options are stored in slots
+    __slots__ = ('edgelist', 'limit_parents', 'max_parents',
+                 'limit_children', 'max_children', 'include_dates',
+                 '_dependencies', '_max_people')
+
     def __init__(self, name, dbase):
+        self.edgelist = None
         self.limit_parents = None
         self.max_parents = None
         self.limit_children = None
         self.max_children = None
+        self.include_dates = None
+        self._dependencies = ()
+        # the limits are counts of people,
+        # so there's no point in going beyond the size of the database
+        npeople = dbase.get_number_of_people() if dbase else 9999
+        self._max_people = min(9999, max(100, npeople))
         MenuReportOptions.__init__(self, name, dbase)
 
     def add_menu_options(self, menu):
+        # the option classes are only needed once the dialog is built
+        from gramps.gen.plug.report import stdoptions
+        from gramps.gen.plug.menu import Option
+        from gramps.gen.plug.menu import (NumberOption, BooleanOption,
+                                          PersonListOption)
+
+        tr = _translations()
 
         # ---------------------
-        category_name = _('Report Options')
-        add_option = partial(menu.add_option, category_name)
+        category_name = tr['cat_report']
         # ---------------------
 
-        add_option('followpar', Option(_('Follow parents to determine '
-                                    '"family lines"'), True))
-        add_option('followchild', Option(_('Follow children to determine '
-                                    '"family lines"'), True))
+        menu.add_option(category_name, 'followpar',
+                        Option(tr['followpar'], True))
+        menu.add_option(category_name, 'followchild',
+                        Option(tr['followchild'], True))
 
         stdoptions.add_name_format_option(menu, category_name)
 
@@ -918,95 +1177,67 @@ class TAMexportOptions(MenuReportOptions):
         locale_opt = stdoptions.add_localization_option(menu, category_name)
         stdoptions.add_date_format_option(menu, category_name, locale_opt)
 
-        self.include_dates = BooleanOption(_('Include dates'), True)
-        self.include_dates.set_help(_('Whether to include dates for people.'))
-        add_option('incdates', self.include_dates)
-        self.include_dates.connect('value-changed', self.includedates_changed)
-
-        # --------------------------------
-        add_option = partial(menu.add_option, _('Edge people'))
-        # --------------------------------
-
-        person_list = PersonListOption(_('Edge people'))
-        person_list.set_help(_('Edge people are used as boundaries. '
-                               'They will not be traversed when determining the full "family".'))
-        add_option('edgelist', person_list)
-        self.edgelist = person_list
-
-        self.limit_parents = BooleanOption(_('Limit the number of ancestors'),
-                                           False)
-        self.limit_parents.set_help(_('Whether to '
-                                      'limit the number of ancestor generations.'))
-        add_option('limitparents', self.limit_parents)
-        self.limit_parents.connect('value-changed', self.limit_changed)
-
-        self.max_parents = NumberOption('', 50, 0, 9999)
-        self.max_parents.set_help(_('The maximum number '
-                                    'of ancestor generations to include.'))
-        add_option('maxparents', self.max_parents)
-
-        self.limit_children = BooleanOption(_('Limit the number '
-                                              'of descendants'),
-                                            False)
-        self.limit_children.set_help(_('Whether to '
-                                       'limit the number of descendant generations.'))
-        add_option('limitchildren', self.limit_children)
-        self.limit_children.connect('value-changed', self.limit_changed)
-
-        self.max_children = NumberOption('', 50, 0, 9999)
-        self.max_children.set_help(_('The maximum number '
-                                     'of descendant generations to include.'))
-        add_option('maxchildren', self.max_children)
-
-        # --------------------------------
-        add_option = partial(menu.add_option, _('Interesting people'))
-        # --------------------------------
-        add_option('gidlist', Option(_('Some people'), " "))
-
-        # sometimes we don't want to list living people
-        includeall_people = BooleanOption(_('Include all people'), False)
-        includeall_people.set_help(_('Mark all people as interesting.'))
-        add_option('allpeople', includeall_people)
-        includeall_people.connect('value-changed', self.includeallpeople_changed)
-
-        remove_extra_people = BooleanOption(_('Try to remove extra '
-                                              'people and families'), True)
-        remove_extra_people.set_help(_('People and families not directly '
-                                       'related to people of interest will '
-                                       'be removed when determining '
-                                       '"family lines".'))
-        add_option('removeextra', remove_extra_people)
-
-        person_list = PersonListOption(_('Interesting people'))
-        person_list.set_help(_('People whose families to include '
-                               'apart from the "Main Person".'))
-        add_option('interestlist', person_list)
-
-        # --------------------
-        add_option = partial(menu.add_option, _('Include'))
-        # --------------------
-
-        self.limit_changed()
-
-    def limit_changed(self):
+        self.include_dates = _option(BooleanOption, (tr['incdates'], True),
+                                     tr['incdates_help'])
+        menu.add_option(category_name, 'incdates', self.include_dates)
+
+        # the remaining options, per category and in the order they are shown:
+        # (name, option class, arguments, help text)
+        spec = (
+            (tr['cat_edge'], (
+                ('edgelist', PersonListOption, (tr['edgelist'],),
+                 tr['edgelist_help']),
+                ('limitparents', BooleanOption, (tr['limitparents'], False),
+                 tr['limitparents_help']),
+                ('maxparents', NumberOption, ('', 50, 0, self._max_people),
+                 tr['maxparents_help']),
+                ('limitchildren', BooleanOption, (tr['limitchildren'], False),
+                 tr['limitchildren_help']),
+                ('maxchildren', NumberOption, ('', 50, 0, self._max_people),
+                 tr['maxchildren_help']),
+                )),
+            (tr['cat_interest'], (
+                ('gidlist', Option, (tr['gidlist'], " "), None),
+                # sometimes we don't want to list living people
+                ('allpeople', BooleanOption, (tr['allpeople'], False),
+                 tr['allpeople_help']),
+                ('removeextra', BooleanOption, (tr['removeextra'], True),
+                 tr['removeextra_help']),
+                ('interestlist', PersonListOption, (tr['interestlist'],),
+                 tr['interestlist_help']),
+                )),
+            )
+        options = {}
+        for (category_name, entries) in spec:
+            for (name, option_class, args, help_text) in entries:
+                options[name] = _option(option_class, args, help_text)
+                menu.add_option(category_name, name, options[name])
+
+        self.edgelist = options['edgelist']
+        self.limit_parents = options['limitparents']
+        self.max_parents = options['maxparents']
+        self.limit_children = options['limitchildren']
+        self.max_children = options['maxchildren']
+
+        # options that are only available depending on another option:
+        # (option, dependent option, available if the option is unset)
+        self._dependencies = tuple(
+            (option, dependent, inverted) for (option, dependent, inverted) in (
+                (self.limit_parents, self.max_parents, False),
+                (self.limit_children, self.max_children, False),
+                (self.include_dates, menu.get_option_by_name('date_format'), False),
+                (options['allpeople'], options['removeextra'], True),
+                ) if dependent)
+        for (option, dependent, inverted) in self._dependencies:
+            option.connect('value-changed', self.dependencies_changed)
+        self.dependencies_changed()
+
+    def dependencies_changed(self):
         """
-        Handle the change of limiting parents and children.
+        Handle the change of an option that other options depend on.
         """
-        self.max_parents.set_available(self.limit_parents.get_value())
-        self.max_children.set_available(self.limit_children.get_value())
-
-    def includedates_changed(self):
-        date_option = self.menu.get_option_by_name('date_format')
-        if not date_option:
-            return
-        date_option.set_available(self.include_dates.get_value())
-
-    def includeallpeople_changed(self):
-        allpeople = self.menu.get_option_by_name('allpeople')
-        if not allpeople: return
-        removeextra = self.menu.get_option_by_name('removeextra')
-        if not removeextra: return
-        removeextra.set_available(not allpeople.get_value())
+        for (option, dependent, inverted) in self._dependencies:
+            dependent.set_available(bool(option.get_value()) != inverted)
 
 class JSONDocument:
     def __init__(self):
@@ -1014,7 +1245,7 @@ class JSONDocument:
     def open(self, filename):
         if os.path.isdir(filename):
             filename=os.path.join(filename, "test.json")
-        self.file = open(filename, "w")
+        self.file = open(filename, "w", encoding="utf-8", buffering=1<<20)
     def close(self):
         if self.file:
             self.file.close()